@@ -0,0 +1,42 @@
+"""
+============================================================================
+Smart Patient Room Monitor - ML Service Gunicorn Configuration
+============================================================================
+Serves the Flask app on gevent workers so request parsing and socket I/O
+of concurrent calls overlap, which also lets the /predict batch scheduler
+coalesce them.
+
+Usage:
+    gunicorn -c gunicorn.conf.py ml_service:app
+
+Run with OMP_NUM_THREADS=1, OPENBLAS_NUM_THREADS=1 and MKL_NUM_THREADS=1
+(set in the Dockerfile and defaulted by ml_service.py itself) so each
+worker's math libraries don't start thread pools that fight the other
+workers for cores. ONNX Runtime ignores these variables; ml_service.py
+pins its session to one thread directly.
+============================================================================
+"""
+
+import os
+from multiprocessing import cpu_count
+
+bind = f"0.0.0.0:{os.environ.get('ML_PORT', 5001)}"
+workers = int(os.environ.get("ML_WORKERS", max(1, cpu_count() // 2)))
+worker_class = "gevent"
+threads = 1  # Leave intra-op threading to the math libraries
+
+# Import the app (which loads the model) once in the master so its memory
+# is shared by the forked workers
+preload_app = True
+
+
+def post_worker_init(worker):
+    """Start the batch scheduler inside each (monkey-patched) worker."""
+    from ml_service import batch_scheduler
+    batch_scheduler.start()
+
+
+def on_exit(server):
+    """Unlink the forest's shared memory segments created by the master."""
+    from ml_service import model_manager
+    model_manager.release_shared_memory()
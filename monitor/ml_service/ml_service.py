@@ -13,18 +13,44 @@ Endpoints:
 - POST /retrain         - Trigger model retraining (with new data)
 
 This service is called by the Rust backend for real-time classification.
+
+Run with gunicorn (see gunicorn.conf.py):
+    gunicorn -c gunicorn.conf.py ml_service:app
 ============================================================================
 """
 
+import os
+
+# One math-library thread per process: concurrency comes from the server's
+# workers. Must run before numpy / scikit-learn are imported.
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import joblib
 import numpy as np
+import orjson
+import atexit
+import functools
 import logging
-import os
+import queue
 import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import onnxruntime as ort
+except ImportError:  # Fall back to scikit-learn inference
+    ort = None
+
+try:
+    from numba import njit
+except ImportError:  # Numba forest evaluator is optional
+    njit = None
 
 # ============================================================================
 # CONFIGURATION
@@ -32,8 +58,10 @@ from typing import Dict, List, Optional
 
 MODEL_DIR = "models"
 MODEL_PATH = f"{MODEL_DIR}/activity_classifier.joblib"
+ONNX_MODEL_PATH = f"{MODEL_DIR}/activity_classifier.onnx"
 ENCODER_PATH = f"{MODEL_DIR}/label_encoder.joblib"
 SCALER_PATH = f"{MODEL_DIR}/scaler.joblib"
+DISCRETIZER_PATH = f"{MODEL_DIR}/discretizer.joblib"
 METADATA_PATH = f"{MODEL_DIR}/model_metadata.json"
 
 # Features expected by the model
@@ -46,11 +74,52 @@ FEATURES = [
     "motion_trend"
 ]
 
+# Columns quantized to 0.1 before inference (and in the memoization key)
+QUANTIZED_COLUMNS = [FEATURES.index("temperature"), FEATURES.index("motion_trend")]
+
+# FHIR component code -> (feature name, value field)
+FHIR_CODE_MAP = {
+    "8310-5": ("temperature", "valueQuantity"),    # LOINC: Body temperature
+    "52821000": ("motion_level", "valueInteger"),  # SNOMED: Activity
+    "89020-2": ("sound_level", "valueInteger")     # LOINC: Sound level
+}
+
+# Bit h is set when hour h counts as night (22:00 - 06:00)
+NIGHT_HOURS_MASK = sum(1 << hour for hour in (22, 23, 0, 1, 2, 3, 4, 5))
+
+# Micro-batching of concurrent /predict requests
+BATCH_SIZE = int(os.environ.get("ML_BATCH_SIZE", 32))
+BATCH_TIMEOUT_MS = float(os.environ.get("ML_BATCH_TIMEOUT_MS", 2))
+
+# Memoized single predictions (keyed on quantized feature values)
+PREDICTION_CACHE_SIZE = int(os.environ.get("ML_PREDICTION_CACHE_SIZE", 4096))
+
 # ============================================================================
 # FLASK APP SETUP
 # ============================================================================
 
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (serializes numpy values natively)."""
+    
+    option = orjson.OPT_SERIALIZE_NUMPY
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=self.option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip of the default response()
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=self.option), mimetype="application/json"
+        )
+
+
 app = Flask(__name__)
+app.config.from_prefixed_env()  # e.g. FLASK_TESTING=true skips model loading
+app.json = OrjsonProvider(app)
 CORS(app)  # Allow cross-origin requests from Rust backend
 
 # Configure logging
@@ -60,20 +129,174 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ============================================================================
+# TIME FEATURES
+# ============================================================================
+
+# (epoch second, hour_of_day, is_night) of the last lookup
+_hour_cache = (None, 0, 0)
+
+
+def current_hour() -> Tuple[int, int]:
+    """Get the local (hour_of_day, is_night), recomputed at most once a second."""
+    global _hour_cache
+    second = int(time.time())
+    cached_second, hour, is_night = _hour_cache
+    if second != cached_second:
+        # localtime() rather than a fixed UTC offset so DST is honoured
+        hour = time.localtime(second).tm_hour
+        is_night = (NIGHT_HOURS_MASK >> hour) & 1
+        _hour_cache = (second, hour, is_night)
+    return hour, is_night
+
+
+# ============================================================================
+# TREE ENSEMBLE EVALUATOR
+# ============================================================================
+
+def flatten_forest(model) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Stack the trees of a fitted tree classifier into padded 2-D arrays.
+    
+    Returns None for models that aren't plain decision trees / forests of
+    decision trees (e.g. gradient boosting), which use another backend.
+    """
+    if hasattr(model, "tree_"):
+        trees = [model]
+    else:
+        trees = getattr(model, "estimators_", None)
+        if not isinstance(trees, list) or not all(hasattr(t, "tree_") for t in trees):
+            return None
+    if getattr(model, "n_outputs_", 1) != 1:
+        return None
+    
+    n_trees = len(trees)
+    n_classes = trees[0].tree_.value.shape[2]
+    max_nodes = max(t.tree_.node_count for t in trees)
+    
+    # Padding nodes are marked as leaves and never reached
+    children_left = np.full((n_trees, max_nodes), -1, dtype=np.int32)
+    children_right = np.full((n_trees, max_nodes), -1, dtype=np.int32)
+    feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    threshold = np.zeros((n_trees, max_nodes), dtype=np.float64)
+    value = np.zeros((n_trees, max_nodes, n_classes), dtype=np.float64)
+    
+    for i, t in enumerate(trees):
+        tree = t.tree_
+        n = tree.node_count
+        children_left[i, :n] = tree.children_left
+        children_right[i, :n] = tree.children_right
+        feature[i, :n] = np.maximum(tree.feature, 0)
+        threshold[i, :n] = tree.threshold
+        # Leaf class distributions, normalized like DecisionTree.predict_proba
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1, keepdims=True)
+        totals[totals == 0.0] = 1.0
+        value[i, :n] = counts / totals
+    
+    return {
+        "children_left": children_left,
+        "children_right": children_right,
+        "feature": feature,
+        "threshold": threshold,
+        "value": value
+    }
+
+
+def share_forest(
+    forest: Dict[str, np.ndarray]
+) -> Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]:
+    """
+    Copy the flattened forest arrays into POSIX shared memory segments.
+    
+    Workers forked afterwards map the same segments, so the tree arrays are
+    held once per host however many workers run. Returns the shared-memory
+    backed arrays and the segments, which the creating process must unlink.
+    """
+    shared = {}
+    segments = []
+    for key, array in forest.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        shared[key] = view
+        segments.append(shm)
+    return shared, segments
+
+
+if njit is not None:
+    # Compiled serially: requests arrive on several server threads, and
+    # Numba's parallel threading layers are not safe to launch that way
+    @njit(fastmath=True, cache=True)
+    def forest_proba(X, children_left, children_right, feature, threshold, value):
+        """Average leaf class probabilities over all trees for each row of X."""
+        n_rows = X.shape[0]
+        n_trees = children_left.shape[0]
+        n_classes = value.shape[2]
+        out = np.zeros((n_rows, n_classes), dtype=np.float64)
+        
+        for i in range(n_rows):
+            for t in range(n_trees):
+                node = 0
+                while children_left[t, node] != -1:
+                    if X[i, feature[t, node]] <= threshold[t, node]:
+                        node = children_left[t, node]
+                    else:
+                        node = children_right[t, node]
+                for k in range(n_classes):
+                    out[i, k] += value[t, node, k]
+            for k in range(n_classes):
+                out[i, k] /= n_trees
+        
+        return out
+
+
 # ============================================================================
 # MODEL LOADING
 # ============================================================================
 
+def compile_feature_reader(features: List[str]):
+    """
+    Generate a function yielding the feature values of each reading in order.
+    
+    The feature names are fixed, so the lookups are written out as
+    straight-line code instead of an inner loop over the name list.
+    """
+    source = "def feature_values(features_list):\n"
+    source += "    for f in features_list:\n"
+    source += "".join(f"        yield f.get({name!r}, 0.0)\n" for name in features)
+    namespace = {}
+    exec(compile(source, "<feature_values>", "exec"), namespace)
+    return namespace["feature_values"]
+
+
 class ModelManager:
     """Manages ML model loading and predictions."""
     
     def __init__(self):
         self.model = None
+        self.session = None
+        self.forest = None
+        self._segments: List[shared_memory.SharedMemory] = []
+        self._segments_pid = None
+        # Also covers servers without gunicorn's on_exit hook
+        atexit.register(self.release_shared_memory)
         self.label_encoder = None
+        self._classes = ()
+        self._class_array = None
         self.scaler = None
+        self._bin_edges = None
         self.metadata = None
         self.is_loaded = False
         self.load_lock = threading.Lock()
+        # Per-thread reusable input row and output template
+        self._local = threading.local()
+        self._feature_values = compile_feature_reader(FEATURES)
+        # Consecutive readings from a room usually quantize to the same key,
+        # so the serialized response is cached as-is
+        self._predict_cached = functools.lru_cache(maxsize=PREDICTION_CACHE_SIZE)(
+            self._predict_row
+        )
     
     def load_model(self) -> bool:
         """Load the trained model and preprocessing objects."""
@@ -81,24 +304,73 @@ class ModelManager:
             try:
                 logger.info("Loading ML model...")
                 
-                # Load model
-                self.model = joblib.load(MODEL_PATH)
+                # Load model memory-mapped so forked workers share its pages
+                # (requires the uncompressed dump written by train_model.py)
+                self.model = joblib.load(MODEL_PATH, mmap_mode='r')
                 logger.info(f"✓ Model loaded from {MODEL_PATH}")
                 
+                # Pick the inference backend: the Numba evaluator for tree
+                # ensembles, then ONNX Runtime, then plain scikit-learn
+                forest = flatten_forest(self.model) if njit is not None else None
+                self.forest = None
+                self.session = None
+                self.release_shared_memory()
+                if forest is not None:
+                    self.forest, self._segments = share_forest(forest)
+                    self._segments_pid = os.getpid()
+                if self.forest is not None:
+                    logger.info(f"✓ Using Numba forest evaluator")
+                elif ort is not None and os.path.exists(ONNX_MODEL_PATH):
+                    # ONNX Runtime ignores OMP_NUM_THREADS and friends, so pin
+                    # it to the calling thread explicitly. With no pool threads
+                    # the session also survives gunicorn forking the workers.
+                    options = ort.SessionOptions()
+                    options.intra_op_num_threads = 1
+                    options.inter_op_num_threads = 1
+                    self.session = ort.InferenceSession(
+                        ONNX_MODEL_PATH, sess_options=options,
+                        providers=['CPUExecutionProvider']
+                    )
+                    logger.info(f"✓ ONNX model loaded from {ONNX_MODEL_PATH}")
+                
                 # Load label encoder
                 self.label_encoder = joblib.load(ENCODER_PATH)
+                # Plain tuple so decoding a label is an index, not an sklearn call
+                self._classes = tuple(str(c) for c in self.label_encoder.classes_)
+                self._class_array = np.array(self._classes, dtype=object)
                 logger.info(f"✓ Label encoder loaded")
                 
-                # Load scaler
-                self.scaler = joblib.load(SCALER_PATH)
-                logger.info(f"✓ Scaler loaded")
-                
                 # Load metadata
                 import json
                 with open(METADATA_PATH, 'r') as f:
                     self.metadata = json.load(f)
                 logger.info(f"✓ Metadata loaded")
                 
+                # Load discretizer or scaler, depending on how the model was trained
+                if self.metadata.get("preprocessing") == "quantile_bins":
+                    discretizer = joblib.load(DISCRETIZER_PATH)
+                    # Low-cardinality features were passed through unbinned
+                    binned = list(discretizer.feature_names_in_)
+                    # Inner edges in float32, the dtype of the input buffers, so
+                    # values on an edge land in the same bin as during training
+                    self._bin_edges = [
+                        (FEATURES.index(name), edges[1:-1].astype(np.float32))
+                        for name, edges in zip(binned, discretizer.bin_edges_)
+                    ]
+                    self.scaler = None
+                    logger.info(f"✓ Discretizer loaded")
+                else:
+                    self.scaler = joblib.load(SCALER_PATH, mmap_mode='r')
+                    # StandardScaler is affine: precompute x * (1/scale) - mean/scale
+                    # in float32 so inputs can be scaled in place in one pass
+                    self._inv_scale = (1.0 / self.scaler.scale_).astype(np.float32)
+                    self._bias = (-self.scaler.mean_ / self.scaler.scale_).astype(np.float32)
+                    self._bin_edges = None
+                    logger.info(f"✓ Scaler loaded")
+                
+                # Cached predictions belong to the previous model
+                self._predict_cached.cache_clear()
+                
                 self.is_loaded = True
                 logger.info("✅ ML model ready!")
                 return True
@@ -108,36 +380,144 @@ class ModelManager:
                 self.is_loaded = False
                 return False
     
+    def release_shared_memory(self):
+        """
+        Detach from the forest's shared memory segments.
+        
+        The process that created them also unlinks them; call this from the
+        server's shutdown hook (gunicorn's on_exit in gunicorn.conf.py).
+        """
+        segments, self._segments = self._segments, []
+        self.forest = None
+        for shm in segments:
+            try:
+                shm.close()
+            except BufferError:  # A request still holds a view; unmapped on exit
+                pass
+            if self._segments_pid == os.getpid():
+                shm.unlink()
+    
+    def _feature_matrix(self, features_list: List[Dict]) -> np.ndarray:
+        """
+        Build the (n_samples, n_features) float32 input matrix in one pass.
+        
+        Temperature and motion trend are rounded to 0.1 exactly as in
+        predict_json, so a reading scores the same on every path.
+        """
+        X = np.fromiter(
+            self._feature_values(features_list),
+            dtype=np.float64,
+            count=len(features_list) * len(FEATURES)
+        ).reshape(len(features_list), len(FEATURES))
+        # Round in float64 (half to even, like round()) before narrowing
+        X[:, QUANTIZED_COLUMNS] = np.rint(X[:, QUANTIZED_COLUMNS] * 10) / 10
+        X = X.astype(np.float32)
+        # Missing values arrive as NaN, which binning would silently accept
+        if not np.isfinite(X).all():
+            raise ValueError("Feature values must be finite numbers")
+        return X
+    
+    def _row_buffer(self) -> np.ndarray:
+        """Get this thread's preallocated (1, n_features) float32 buffer."""
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = self._local.row = np.zeros((1, len(FEATURES)), dtype=np.float32)
+        return buf
+    
+    def _output_template(self) -> Dict:
+        """Get this thread's reusable prediction dict for the loaded classes."""
+        cached = getattr(self._local, "template", None)
+        if cached is None or cached[0] is not self._classes:
+            template = {
+                "activity_class": "",
+                "confidence": 0.0,
+                "confidence_scores": dict.fromkeys(self._classes, 0.0)
+            }
+            cached = self._local.template = (self._classes, template)
+        return cached[1]
+    
+    def _dumps_prediction(self, probabilities: List[float]) -> bytes:
+        """Serialize one prediction through the thread's output template."""
+        # The predicted class is the most probable one (first on ties, like argmax)
+        confidence = max(probabilities)
+        template = self._output_template()
+        template["activity_class"] = self._classes[probabilities.index(confidence)]
+        template["confidence"] = confidence
+        scores = template["confidence_scores"]
+        for name, probability in zip(self._classes, probabilities):
+            scores[name] = probability
+        # orjson copies the values out, so the template is free to reuse
+        return orjson.dumps(template)
+    
+    def _preprocess_inplace(self, X: np.ndarray) -> np.ndarray:
+        """Replace raw feature values in X with bin codes or scaled values."""
+        if self._bin_edges is not None:
+            for j, edges in self._bin_edges:
+                X[:, j] = np.searchsorted(edges, X[:, j], side='right')
+            return X
+        return self._scale_inplace(X)
+    
+    def _scale_inplace(self, X: np.ndarray) -> np.ndarray:
+        """Apply the fitted scaler to X in place (no intermediate arrays)."""
+        np.multiply(X, self._inv_scale, out=X)
+        np.add(X, self._bias, out=X)
+        return X
+    
+    def _infer(self, X: np.ndarray) -> np.ndarray:
+        """
+        Run the model, returning class probabilities.
+        
+        Callers take the argmax for the label instead of asking the model
+        to predict() as well, which would evaluate it a second time.
+        """
+        if self.forest is not None:
+            return forest_proba(X, **self.forest)
+        if self.session is not None:
+            return self.session.run(
+                ['probabilities'], {'X': X.astype(np.float32, copy=False)}
+            )[0]
+        return self.model.predict_proba(X)
+    
     def predict(self, features: Dict) -> Dict:
         """Make a single prediction."""
+        return orjson.loads(self.predict_json(features))
+    
+    def predict_json(self, features: Dict) -> bytes:
+        """
+        Make a single prediction and return it as a JSON document.
+        
+        Results are memoized on the feature values, with temperature and
+        motion trend quantized to 0.1.
+        """
         if not self.is_loaded:
             raise RuntimeError("Model not loaded")
         
-        # Prepare features
-        feature_values = [features.get(f, 0) for f in FEATURES]
-        X = np.array([feature_values])
+        return self._predict_cached(
+            round(features.get("temperature", 0.0) * 10),
+            features.get("motion_level", 0),
+            features.get("sound_level", 0),
+            features.get("hour_of_day", 0),
+            features.get("is_night", 0),
+            round(features.get("motion_trend", 0.0) * 10)
+        )
+    
+    def _predict_row(self, temperature_q, motion_level, sound_level,
+                     hour_of_day, is_night, motion_trend_q) -> bytes:
+        """Run the model on one sample (temperature/trend in tenths)."""
+        # Prepare features with one tuple assignment into the reused buffer
+        X = self._row_buffer()
+        X[0] = (temperature_q / 10, motion_level, sound_level,
+                hour_of_day, is_night, motion_trend_q / 10)
+        if not np.isfinite(X).all():
+            raise ValueError("Feature values must be finite numbers")
         
         # Scale features
-        X_scaled = self.scaler.transform(X)
+        X_scaled = self._preprocess_inplace(X)
         
         # Predict
-        prediction = self.model.predict(X_scaled)[0]
-        probabilities = self.model.predict_proba(X_scaled)[0]
+        probabilities = self._infer(X_scaled)
         
-        # Decode label
-        activity_class = self.label_encoder.inverse_transform([prediction])[0]
-        
-        # Get confidence scores for all classes
-        confidence_scores = {
-            self.label_encoder.inverse_transform([i])[0]: float(prob)
-            for i, prob in enumerate(probabilities)
-        }
-        
-        return {
-            "activity_class": activity_class,
-            "confidence": float(max(probabilities)),
-            "confidence_scores": confidence_scores
-        }
+        return self._dumps_prediction(probabilities[0].tolist())
     
     def predict_batch(self, features_list: List[Dict]) -> List[Dict]:
         """Make batch predictions."""
@@ -145,32 +525,144 @@ class ModelManager:
             raise RuntimeError("Model not loaded")
         
         # Prepare features
-        X = np.array([
-            [f.get(feat, 0) for feat in FEATURES]
-            for f in features_list
-        ])
+        X = self._feature_matrix(features_list)
         
         # Scale features
-        X_scaled = self.scaler.transform(X)
+        X_scaled = self._preprocess_inplace(X)
         
         # Predict
-        predictions = self.model.predict(X_scaled)
-        probabilities = self.model.predict_proba(X_scaled)
+        probabilities = self._infer(X_scaled)
+        
+        # Decode and reduce all rows at once. The response stays one object
+        # per reading since that is what the Rust client deserializes.
+        labels = self._class_array[probabilities.argmax(axis=1)].tolist()
+        confidences = probabilities.max(axis=1).tolist()
         
-        results = []
-        for i, (pred, probs) in enumerate(zip(predictions, probabilities)):
-            activity_class = self.label_encoder.inverse_transform([pred])[0]
-            results.append({
-                "index": i,
-                "activity_class": activity_class,
-                "confidence": float(max(probs))
-            })
+        return [
+            {"index": i, "activity_class": label, "confidence": confidence}
+            for i, (label, confidence) in enumerate(zip(labels, confidences))
+        ]
+    
+    def predict_many_json(self, features_list: List[Dict]) -> List[bytes]:
+        """Make single-style predictions for several samples in one model call."""
+        if not self.is_loaded:
+            raise RuntimeError("Model not loaded")
+        
+        # Prepare features
+        X = self._feature_matrix(features_list)
+        
+        # Scale features
+        X_scaled = self._preprocess_inplace(X)
         
-        return results
+        # Predict
+        probabilities = self._infer(X_scaled)
+        
+        return [self._dumps_prediction(probs) for probs in probabilities.tolist()]
+
+
+class BatchScheduler:
+    """
+    Coalesces concurrent single predictions into one model call.
+    
+    Requests are queued and a background worker drains up to `batch_size`
+    of them (waiting at most `batch_timeout_ms` for stragglers), runs a
+    single batched prediction and hands each caller its own result.
+    """
+    
+    def __init__(self, manager: ModelManager, batch_size: int = BATCH_SIZE,
+                 batch_timeout_ms: float = BATCH_TIMEOUT_MS):
+        self.manager = manager
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout_ms / 1000.0
+        self.queue = None
+        self.worker = None
+        self.start_lock = threading.Lock()
+    
+    def start(self):
+        """
+        Start the worker thread.
+        
+        Called from gunicorn's post_worker_init hook, i.e. after the fork and
+        after gevent has monkey-patched threading, so the queue and worker
+        are created with the worker's own primitives. Other servers start it
+        lazily on the first request.
+        """
+        with self.start_lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.queue = queue.Queue()
+                self.worker = threading.Thread(
+                    target=self._run, name="batch-scheduler", daemon=True
+                )
+                self.worker.start()
+    
+    def submit(self, features: Dict) -> bytes:
+        """Queue a single prediction and block until its JSON result is ready."""
+        if self.worker is None:
+            self.start()
+        
+        done = threading.Event()
+        slot = {}
+        self.queue.put((features, done, slot))
+        done.wait()
+        
+        if "error" in slot:
+            raise slot["error"]
+        return slot["result"]
+    
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            deadline = time.monotonic() + self.batch_timeout
+            
+            while len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._dispatch(items)
+    
+    def _dispatch(self, items: List):
+        if len(items) == 1:
+            # Nothing to coalesce; take the memoized single-sample path
+            try:
+                results = [self.manager.predict_json(items[0][0])]
+            except Exception as e:
+                results = [e]
+        else:
+            results = self._predict_items(items)
+        
+        for (_, done, slot), result in zip(items, results):
+            if isinstance(result, Exception):
+                slot["error"] = result
+            else:
+                slot["result"] = result
+            done.set()
+    
+    def _predict_items(self, items: List) -> List:
+        """Predict several queued items, returning a result or exception each."""
+        try:
+            return self.manager.predict_many_json(
+                [features for features, _, _ in items]
+            )
+        except Exception:
+            # Retry one by one so a single bad request doesn't fail the batch,
+            # validated exactly as if it had been served alone
+            results = []
+            for features, _, _ in items:
+                try:
+                    results.append(self.manager.predict_json(features))
+                except Exception as e:
+                    results.append(e)
+            return results
 
 
 # Global model manager
 model_manager = ModelManager()
+batch_scheduler = BatchScheduler(model_manager)
 
 # ============================================================================
 # API ENDPOINTS
@@ -222,13 +714,11 @@ def predict():
         "confidence_scores": {...}
     }
     """
-    if not model_manager.is_loaded:
-        return jsonify({"error": "Model not loaded"}), 503
-    
     try:
-        data = request.get_json()
-        prediction = model_manager.predict(data)
-        return jsonify(prediction)
+        data = orjson.loads(request.get_data(cache=False))
+        prediction = batch_scheduler.submit(data)
+        # Already serialized by the model manager
+        return app.response_class(prediction, mimetype="application/json")
     except Exception as e:
         logger.error(f"Prediction error: {e}")
         return jsonify({"error": str(e)}), 500
@@ -247,11 +737,8 @@ def predict_batch():
         ]
     }
     """
-    if not model_manager.is_loaded:
-        return jsonify({"error": "Model not loaded"}), 503
-    
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data(cache=False))
         readings = data.get('readings', [])
         predictions = model_manager.predict_batch(readings)
         return jsonify({"predictions": predictions})
@@ -287,35 +774,28 @@ def fhir_classify():
     
     Extracts sensor values from FHIR Observation components.
     """
-    if not model_manager.is_loaded:
-        return jsonify({"error": "Model not loaded"}), 503
-    
     try:
-        observation = request.get_json()
+        observation = orjson.loads(request.get_data(cache=False))
         
         # Extract values from FHIR components
         features = {}
-        for component in observation.get('component', []):
-            code = component.get('code', {})
-            # Temperature
-            if '8310-5' in str(code):
-                features['temperature'] = component.get('valueQuantity', {}).get('value', 0)
-            # Motion
-            elif '52821000' in str(code):
-                features['motion_level'] = component.get('valueInteger', 0)
-            # Sound
-            elif '89020-2' in str(code):
-                features['sound_level'] = component.get('valueInteger', 0)
+        for component in observation.get('component', ()):
+            for coding in component.get('code', {}).get('coding', ()):
+                spec = FHIR_CODE_MAP.get(coding.get('code'))
+                if spec is not None:
+                    name, key = spec
+                    if key == 'valueQuantity':
+                        features[name] = component.get(key, {}).get('value', 0)
+                    else:
+                        features[name] = component.get(key, 0)
+                    break
         
         # Add time-based features
-        from datetime import datetime
-        now = datetime.now()
-        features['hour_of_day'] = now.hour
-        features['is_night'] = 1 if (now.hour >= 22 or now.hour < 6) else 0
+        features['hour_of_day'], features['is_night'] = current_hour()
         features['motion_trend'] = 0  # Would need history
         
-        prediction = model_manager.predict(features)
-        return jsonify(prediction)
+        prediction = model_manager.predict_json(features)
+        return app.response_class(prediction, mimetype="application/json")
         
     except Exception as e:
         logger.error(f"FHIR classification error: {e}")
@@ -326,13 +806,6 @@ def fhir_classify():
 # STARTUP
 # ============================================================================
 
-@app.before_request
-def ensure_model_loaded():
-    """Ensure model is loaded before handling requests."""
-    if not model_manager.is_loaded and request.endpoint != 'health_check':
-        model_manager.load_model()
-
-
 def initialize():
     """Initialize the service."""
     logger.info("="*60)
@@ -346,20 +819,7 @@ def initialize():
         logger.warning("⚠️  Service started but model not loaded")
 
 
-# ============================================================================
-# MAIN
-# ============================================================================
-
-if __name__ == "__main__":
+# Load the model once at import time instead of checking on every request.
+# Under gunicorn's preload_app this runs in the master, before workers fork.
+if not app.config.get("TESTING"):
     initialize()
-    
-    # Run Flask server
-    port = int(os.environ.get("ML_PORT", 5001))
-    
-    logger.info(f"🚀 Starting ML service on port {port}...")
-    
-    app.run(
-        host="0.0.0.0",
-        port=port,
-        debug=os.environ.get("DEBUG", "false").lower() == "true"
-    )
@@ -0,0 +1,86 @@
+"""
+============================================================================
+Smart Patient Room Monitor - ML Service Unit Tests
+============================================================================
+Run from monitor/ml_service:
+    pytest -q
+============================================================================
+"""
+
+import threading
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import ml_service
+from ml_service import BatchScheduler, flatten_forest
+
+
+# ============================================================================
+# TREE ENSEMBLE EVALUATOR
+# ============================================================================
+
+@pytest.mark.skipif(ml_service.njit is None, reason="numba not installed")
+def test_forest_proba_matches_predict_proba():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] > 0).astype(int) + (X[:, 2] > 1).astype(int)
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0)
+    model.fit(X, y)
+
+    X_new = rng.normal(size=(200, 6)).astype(np.float32)
+    probabilities = ml_service.forest_proba(X_new, **flatten_forest(model))
+
+    np.testing.assert_allclose(probabilities, model.predict_proba(X_new), atol=1e-9)
+
+
+# ============================================================================
+# BATCH SCHEDULER
+# ============================================================================
+
+class FakeManager:
+    """Echoes each reading's id back; readings marked "bad" raise."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict_json(self, features):
+        if features.get("bad"):
+            raise ValueError(f"bad reading {features['id']}")
+        return str(features["id"]).encode()
+
+    def predict_many_json(self, features_list):
+        self.batch_sizes.append(len(features_list))
+        if any(f.get("bad") for f in features_list):
+            raise ValueError("batch contains a bad reading")
+        return [str(f["id"]).encode() for f in features_list]
+
+
+def test_batch_scheduler_isolates_results_and_errors():
+    manager = FakeManager()
+    # Long timeout so the concurrent submissions are coalesced
+    scheduler = BatchScheduler(manager, batch_size=8, batch_timeout_ms=200)
+    scheduler.start()
+
+    readings = [{"id": i, "bad": i == 3} for i in range(8)]
+    outcomes = {}
+
+    def submit(features):
+        try:
+            outcomes[features["id"]] = scheduler.submit(features)
+        except ValueError as e:
+            outcomes[features["id"]] = e
+
+    threads = [threading.Thread(target=submit, args=(r,)) for r in readings]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert max(manager.batch_sizes) > 1
+    assert isinstance(outcomes[3], ValueError)
+    assert "3" in str(outcomes[3])
+    for i in range(8):
+        if i != 3:
+            assert outcomes[i] == str(i).encode()
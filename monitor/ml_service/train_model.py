@@ -8,6 +8,7 @@ sensor data (motion, sound, temperature).
 Models:
 - Decision Tree (simple, interpretable)
 - Random Forest (better accuracy)
+- Histogram Gradient Boosting (default; small, fast to evaluate)
 
 Output:
 - Trained model (model.joblib)
@@ -22,8 +23,9 @@ import joblib
 import os
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
+from sklearn.preprocessing import LabelEncoder, StandardScaler, KBinsDiscretizer
 from sklearn.metrics import (
     classification_report, 
     confusion_matrix, 
@@ -35,13 +37,28 @@ import warnings
 warnings.filterwarnings('ignore')
 from datetime import datetime
 
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:  # ONNX export is optional; the service falls back to joblib
+    convert_sklearn = None
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 DATA_FILE = "training_data/training_data.csv"
 MODEL_OUTPUT_DIR = "models"
-MODEL_TYPE = "random_forest"  # "decision_tree" or "random_forest"
+MODEL_TYPE = "hist_gbdt"  # "decision_tree", "random_forest" or "hist_gbdt"
+
+# Feature preprocessing: "standard_scaler" standardizes the raw values;
+# "quantile_bins" maps each feature to bin codes (255 bins, matching
+# HistGradientBoosting's max_bins). Features with at most
+# BIN_MIN_DISTINCT_VALUES distinct values (is_night, hour_of_day) are passed
+# through as-is, since quantile binning would collapse them.
+PREPROCESSING = "standard_scaler"
+N_BINS = 255
+BIN_MIN_DISTINCT_VALUES = 32
 
 # Features to use for training
 FEATURES = [
@@ -91,15 +108,25 @@ def preprocess_data(df: pd.DataFrame) -> tuple:
     label_encoder = LabelEncoder()
     y_encoded = label_encoder.fit_transform(y)
     
-    # Scale features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-    X_scaled = pd.DataFrame(X_scaled, columns=FEATURES)
+    # Quantize or scale features
+    if PREPROCESSING == "quantile_bins":
+        binned = [f for f in FEATURES if X[f].nunique() > BIN_MIN_DISTINCT_VALUES]
+        preprocessor = KBinsDiscretizer(
+            n_bins=N_BINS, encode='ordinal', strategy='quantile', subsample=None
+        )
+        # Fitted on a frame, so feature_names_in_ tells the service which
+        # columns to bin
+        X_prepared = X.astype(np.float32)
+        X_prepared[binned] = preprocessor.fit_transform(X[binned])
+        print(f"   Bins per feature: {dict(zip(binned, preprocessor.n_bins_.tolist()))}")
+    else:
+        preprocessor = StandardScaler()
+        X_prepared = pd.DataFrame(preprocessor.fit_transform(X), columns=FEATURES)
     
     print(f"   Features: {FEATURES}")
     print(f"   Classes: {list(label_encoder.classes_)}")
     
-    return X_scaled, y_encoded, label_encoder, scaler
+    return X_prepared, y_encoded, label_encoder, preprocessor
 
 
 # ============================================================================
@@ -138,6 +165,24 @@ def train_random_forest(X_train, y_train) -> RandomForestClassifier:
     return model
 
 
+def train_hist_gbdt(X_train, y_train) -> HistGradientBoostingClassifier:
+    """Train a Histogram Gradient Boosting classifier."""
+    print("📈 Training Histogram Gradient Boosting...")
+    
+    # Binned features and shallow trees: a much smaller model than the
+    # forest, with far fewer nodes to walk per prediction
+    model = HistGradientBoostingClassifier(
+        max_iter=200,
+        max_depth=6,
+        learning_rate=0.1,
+        early_stopping=True,
+        random_state=42
+    )
+    model.fit(X_train, y_train)
+    
+    return model
+
+
 # ============================================================================
 # MODEL EVALUATION
 # ============================================================================
@@ -180,12 +225,18 @@ def evaluate_model(model, X_test, y_test, label_encoder) -> dict:
     }
 
 
-def analyze_feature_importance(model, feature_names: list) -> dict:
+def analyze_feature_importance(model, feature_names: list, X=None, y=None) -> dict:
     """Analyze and display feature importance."""
     print("\n🔍 Feature Importance:")
     print("-" * 40)
     
-    importances = model.feature_importances_
+    if hasattr(model, "feature_importances_"):
+        importances = model.feature_importances_
+    else:
+        # Boosted models have no impurity importances; use permutation
+        importances = permutation_importance(
+            model, X, y, n_repeats=5, random_state=42
+        ).importances_mean
     indices = np.argsort(importances)[::-1]
     
     importance_dict = {}
@@ -200,28 +251,58 @@ def analyze_feature_importance(model, feature_names: list) -> dict:
 # MODEL SAVING
 # ============================================================================
 
-def save_model(model, label_encoder, scaler, metrics: dict, importance: dict):
+def save_model(model, label_encoder, preprocessor, metrics: dict, importance: dict):
     """Save trained model and metadata."""
     os.makedirs(MODEL_OUTPUT_DIR, exist_ok=True)
     
-    # Save model
+    # Trained on all cores, but served with one thread per service worker
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    
+    # Save model (uncompressed so the service can memory-map it)
     model_path = f"{MODEL_OUTPUT_DIR}/activity_classifier.joblib"
-    joblib.dump(model, model_path)
+    joblib.dump(model, model_path, compress=0)
     print(f"\n💾 Model saved to: {model_path}")
     
+    # Export to ONNX for ONNX Runtime serving (probabilities as a plain
+    # tensor rather than a list of per-class dicts). Any previous export is
+    # removed first so the service never pairs a stale ONNX file with the
+    # new model.
+    onnx_path = f"{MODEL_OUTPUT_DIR}/activity_classifier.onnx"
+    if os.path.exists(onnx_path):
+        os.remove(onnx_path)
+    if convert_sklearn is None:
+        print("⚠️  skl2onnx not installed, skipping ONNX export")
+    else:
+        try:
+            onnx_model = convert_sklearn(
+                model,
+                initial_types=[('X', FloatTensorType([None, len(FEATURES)]))],
+                options={id(model): {'zipmap': False}}
+            )
+            with open(onnx_path, 'wb') as f:
+                f.write(onnx_model.SerializeToString())
+            print(f"💾 ONNX model saved to: {onnx_path}")
+        except Exception as e:
+            print(f"⚠️  ONNX export failed, service will use the joblib model: {e}")
+    
     # Save label encoder
     encoder_path = f"{MODEL_OUTPUT_DIR}/label_encoder.joblib"
     joblib.dump(label_encoder, encoder_path)
     print(f"💾 Label encoder saved to: {encoder_path}")
     
-    # Save scaler
-    scaler_path = f"{MODEL_OUTPUT_DIR}/scaler.joblib"
-    joblib.dump(scaler, scaler_path)
-    print(f"💾 Scaler saved to: {scaler_path}")
+    # Save scaler / discretizer (bin edges)
+    if PREPROCESSING == "quantile_bins":
+        preprocessor_path = f"{MODEL_OUTPUT_DIR}/discretizer.joblib"
+    else:
+        preprocessor_path = f"{MODEL_OUTPUT_DIR}/scaler.joblib"
+    joblib.dump(preprocessor, preprocessor_path, compress=0)
+    print(f"💾 Preprocessor saved to: {preprocessor_path}")
     
     # Save metadata
     metadata = {
         "model_type": MODEL_TYPE,
+        "preprocessing": PREPROCESSING,
         "features": FEATURES,
         "classes": list(label_encoder.classes_),
         "metrics": metrics,
@@ -261,7 +342,7 @@ def main():
     df = load_data(DATA_FILE)
     
     # Preprocess
-    X, y, label_encoder, scaler = preprocess_data(df)
+    X, y, label_encoder, preprocessor = preprocess_data(df)
     
     # Split data
     print("\n📊 Splitting data (80% train, 20% test)...")
@@ -274,6 +355,8 @@ def main():
     # Train model
     if MODEL_TYPE == "decision_tree":
         model = train_decision_tree(X_train, y_train)
+    elif MODEL_TYPE == "hist_gbdt":
+        model = train_hist_gbdt(X_train, y_train)
     else:
         model = train_random_forest(X_train, y_train)
     
@@ -284,10 +367,10 @@ def main():
     metrics = evaluate_model(model, X_test, y_test, label_encoder)
     
     # Feature importance
-    importance = analyze_feature_importance(model, FEATURES)
+    importance = analyze_feature_importance(model, FEATURES, X_test, y_test)
     
     # Save model
-    save_model(model, label_encoder, scaler, metrics, importance)
+    save_model(model, label_encoder, preprocessor, metrics, importance)
     
     print("\n" + "="*60)
     print("✅ Model training complete!")
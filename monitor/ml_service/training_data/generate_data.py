@@ -21,12 +21,19 @@ Activity Classifications:
 
 import pandas as pd
 import numpy as np
-import random
-import json
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import orjson
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
-import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+from numpy.random import Generator, SeedSequence, SFC64
+
+try:
+    from numba import njit
+except ImportError:  # Fall back to NumPy array expressions
+    njit = None
 
 # ============================================================================
 # CONFIGURATION
@@ -34,6 +41,10 @@ import uuid
 
 NUM_SAMPLES = 5000  # Total training samples
 OUTPUT_DIR = "training_data"
+RANDOM_SEED = None  # Set to an int for a reproducible dataset
+
+# Fast bit generator for the bulk sampling
+RNG = Generator(SFC64(RANDOM_SEED))
 
 # Activity class distribution (realistic hospital setting)
 CLASS_DISTRIBUTION = {
@@ -45,6 +56,9 @@ CLASS_DISTRIBUTION = {
     "FALL_DETECTED": 0.03  # 3% - Actual falls (rare)
 }
 
+# Night hours: 22:00 - 06:00
+NIGHT_HOURS = np.array([22, 23, 0, 1, 2, 3, 4, 5], dtype=np.uint8)
+
 # ============================================================================
 # SENSOR PATTERNS FOR EACH ACTIVITY CLASS
 # ============================================================================
@@ -118,99 +132,229 @@ ACTIVITY_PATTERNS = {
     }
 }
 
+# Struct-of-arrays view of ACTIVITY_PATTERNS, indexed by activity id, so
+# batch code looks parameters up by integer instead of nested dict keys
+ACTIVITIES = list(ACTIVITY_PATTERNS)
+ACT_TO_ID = {activity: i for i, activity in enumerate(ACTIVITIES)}
+
+
+def _pattern_array(key: str) -> np.ndarray:
+    return np.array([ACTIVITY_PATTERNS[a][key] for a in ACTIVITIES], dtype=np.float64)
+
+
+MOTION_LO, MOTION_HI = _pattern_array("motion_range").T
+SOUND_LO, SOUND_HI = _pattern_array("sound_range").T
+TEMP_LO, TEMP_HI = _pattern_array("temp_range").T
+MOTION_VAR = _pattern_array("motion_variance")
+SOUND_VAR = _pattern_array("sound_variance")
+NIGHT_WEIGHT = np.array(
+    [ACTIVITY_PATTERNS[a]["hour_weights"]["night"] for a in ACTIVITIES], dtype=np.float64
+)
+FALL_DETECTED_ID = ACT_TO_ID["FALL_DETECTED"]
+
+# Affine sampling parameters per class for (motion, sound, temperature):
+# value = lo + U(0, 1) * span + N(0, 1) * sd
+SENSOR_LO = np.stack([MOTION_LO, SOUND_LO, TEMP_LO], axis=1)
+SENSOR_SPAN = np.stack([MOTION_HI - MOTION_LO, SOUND_HI - SOUND_LO, TEMP_HI - TEMP_LO], axis=1)
+SENSOR_SD = np.stack([MOTION_VAR / 3, SOUND_VAR / 3, np.full(len(ACTIVITIES), 0.5)], axis=1)
+
+# FALL_DETECTED - spike pattern: fixed motion/sound ranges without noise
+SENSOR_LO[FALL_DETECTED_ID, :2] = (85, 180)
+SENSOR_SPAN[FALL_DETECTED_ID, :2] = (15, 70)
+SENSOR_SD[FALL_DETECTED_ID, :2] = 0
+
+# ============================================================================
+# FHIR OBSERVATION TEMPLATE
+# ============================================================================
+# Parts that are identical in every Observation. They are shared (not
+# copied) between observations, so treat them as read-only.
+
+FHIR_CATEGORY = [{
+    "coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+        "code": "vital-signs",
+        "display": "Vital Signs"
+    }]
+}]
+
+FHIR_CODE = {
+    "coding": [{
+        "system": "http://loinc.org",
+        "code": "85353-1",
+        "display": "Vital signs, weight, height, head circumference, oxygen saturation & BMI panel"
+    }],
+    "text": "Sensor Reading"
+}
+
+FHIR_TEMPERATURE_CODE = {
+    "coding": [{
+        "system": "http://loinc.org",
+        "code": "8310-5",
+        "display": "Body temperature"
+    }]
+}
+
+FHIR_MOTION_CODE = {
+    "coding": [{
+        "system": "http://snomed.info/sct",
+        "code": "52821000",
+        "display": "Activity"
+    }]
+}
+
+FHIR_SOUND_CODE = {
+    "coding": [{
+        "system": "http://loinc.org",
+        "code": "89020-2",
+        "display": "Sound level"
+    }]
+}
+
+FHIR_CLASSIFICATION_CODE = {
+    "text": "Activity Classification"
+}
+
+# Patient id -> subject reference
+FHIR_SUBJECTS: Dict[str, Dict] = {}
+
 # ============================================================================
 # DATA GENERATION FUNCTIONS
 # ============================================================================
 
-def get_hour_for_activity(activity: str) -> int:
-    """Generate appropriate hour based on activity type."""
-    pattern = ACTIVITY_PATTERNS[activity]
-    weights = pattern["hour_weights"]
-    
-    if random.random() < weights["night"]:
-        # Night hours: 22, 23, 0, 1, 2, 3, 4, 5
-        return random.choice([22, 23, 0, 1, 2, 3, 4, 5])
-    else:
-        # Day hours: 6-21
-        return random.randint(6, 21)
+if njit is not None:
+    @njit(cache=True)
+    def combine_sensor_values(uniform, normal, lo, span, sd, motion, sound, temperature):
+        """Scale standard draws into sensor values, clipping them in one pass."""
+        for i in range(motion.shape[0]):
+            m = lo[0] + uniform[0, i] * span[0] + normal[0, i] * sd[0]
+            s = lo[1] + uniform[1, i] * span[1] + normal[1, i] * sd[1]
+            motion[i] = min(max(m, 0.0), 100.0)
+            sound[i] = min(max(s, 0.0), 255.0)
+            temperature[i] = lo[2] + uniform[2, i] * span[2] + normal[2, i] * sd[2]
+else:
+    def combine_sensor_values(uniform, normal, lo, span, sd, motion, sound, temperature):
+        """Scale standard draws into sensor values, then clip them."""
+        values = lo[:, None] + uniform * span[:, None] + normal * sd[:, None]
+        motion[:] = np.clip(values[0], 0, 100)
+        sound[:] = np.clip(values[1], 0, 255)
+        temperature[:] = values[2]
 
 
-def generate_sensor_reading(activity: str, timestamp: datetime) -> Dict:
-    """Generate a single sensor reading for given activity class."""
-    pattern = ACTIVITY_PATTERNS[activity]
+def generate_sensor_batch(activity_id: int, count: int,
+                          rng: Generator = RNG) -> Dict[str, np.ndarray]:
+    """Generate `count` sensor values for given activity class as arrays."""
+    k = activity_id
+    # Narrowest dtypes that hold each column: motion 0-100 and sound 0-255
+    # fit uint8; temperature stays float32 so 0.1 steps print exactly
+    motion = np.empty(count, dtype=np.uint8)
+    sound = np.empty(count, dtype=np.uint8)
+    temperature = np.empty(count, dtype=np.float32)
     
-    # Base values from ranges
-    motion_base = random.uniform(*pattern["motion_range"])
-    sound_base = random.uniform(*pattern["sound_range"])
-    temp_base = random.uniform(*pattern["temp_range"])
+    # Base values from ranges plus some variance: one standard uniform and
+    # one standard normal per value, scaled by the class's parameters
+    combine_sensor_values(
+        rng.random((3, count), dtype=np.float32),
+        rng.standard_normal((3, count), dtype=np.float32),
+        SENSOR_LO[k], SENSOR_SPAN[k], SENSOR_SD[k],
+        motion, sound, temperature
+    )
+    np.round(temperature, 1, out=temperature)
     
-    # Add some variance
-    motion = max(0, min(100, motion_base + random.gauss(0, pattern["motion_variance"] / 3)))
-    sound = max(0, min(255, sound_base + random.gauss(0, pattern["sound_variance"] / 3)))
-    temperature = round(temp_base + random.gauss(0, 0.5), 1)
+    # Appropriate hour based on activity type, by inverse CDF from a single
+    # uniform: [0, w) maps evenly onto night hours 22, 23, 0, 1, 2, 3, 4, 5
+    # and [w, 1) onto day hours 6-21, where w is the class's night weight
+    w = NIGHT_WEIGHT[k]
+    u = rng.random(count)
+    night_idx = np.minimum((u * (8 / w)).astype(np.intp), 7)
+    day_hour = np.minimum(6 + ((u - w) * (16 / (1 - w))).astype(np.intp), 21)
+    hour = np.where(u < w, NIGHT_HOURS[night_idx], day_hour).astype(np.uint8)
+    is_night = ((hour >= 22) | (hour < 6)).view(np.uint8)
     
-    # Special handling for FALL_DETECTED - spike pattern
-    if activity == "FALL_DETECTED":
-        motion = random.uniform(85, 100)
-        sound = random.uniform(180, 250)
+    # Calculate motion trend (would normally use previous readings)
+    motion_trend = rng.uniform(-20, 20, count).astype(np.float32)  # Simulated
+    np.round(motion_trend, 2, out=motion_trend)
     
-    # Derived features
-    hour = timestamp.hour
-    is_night = 1 if (hour >= 22 or hour < 6) else 0
+    return {
+        "temperature": temperature,
+        "motion_level": motion,
+        "sound_level": sound,
+        "hour_of_day": hour,
+        "is_night": is_night,
+        "motion_trend": motion_trend
+    }
+
+
+def generate_uuids(count: int, rng: Generator = RNG) -> List[str]:
+    """Generate `count` random (version 4) UUID strings from one bulk draw."""
+    raw = np.frombuffer(rng.bytes(count * 16), dtype=np.uint8).reshape(count, 16).copy()
     
-    # Calculate motion trend (would normally use previous readings)
-    motion_trend = random.uniform(-20, 20)  # Simulated
+    # Version and variant bits, as set by uuid.uuid4()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    
+    hex_digits = raw.tobytes().hex()
+    return [
+        f"{hex_digits[i:i + 8]}-{hex_digits[i + 8:i + 12]}-{hex_digits[i + 12:i + 16]}-"
+        f"{hex_digits[i + 16:i + 20]}-{hex_digits[i + 20:i + 32]}"
+        for i in range(0, len(hex_digits), 32)
+    ]
+
+
+def generate_timestamps(hours: np.ndarray, rng: Generator = RNG) -> np.ndarray:
+    """
+    Generate ISO 8601 timestamp strings at the given hours of day.
+    
+    Each timestamp is a random time within the last 31 days whose hour is
+    then replaced by the requested one, all in datetime64 arithmetic.
+    """
+    now = np.datetime64(datetime.now(), 'us')
+    timestamps = now - rng.integers(0, 31 * 24 * 60, len(hours)).astype('timedelta64[m]')
+    
+    # Keep the day and the time within the hour, swap in the hour
+    days = timestamps.astype('datetime64[D]')
+    within_hour = timestamps - timestamps.astype('datetime64[h]')
+    timestamps = days + hours.astype('timedelta64[h]') + within_hour
     
+    # Formatted once into Python strs (an object array), which the CSV
+    # column and both FHIR time fields then share by reference
+    return np.char.add(np.datetime_as_string(timestamps, unit='us'), 'Z').astype(object)
+
+
+def generate_sensor_reading(reading_id: str, activity: str, timestamp: str, hour: int,
+                            is_night: int, temperature: float, motion: int, sound: int,
+                            motion_trend: float) -> Dict:
+    """Build a single sensor reading for given activity class."""
     return {
-        "id": str(uuid.uuid4()),
-        "timestamp": timestamp.isoformat() + "Z",
-        "temperature": round(temperature, 1),
-        "motion_level": int(motion),
-        "sound_level": int(sound),
+        "id": reading_id,
+        "timestamp": timestamp,
+        "temperature": temperature,
+        "motion_level": motion,
+        "sound_level": sound,
         "hour_of_day": hour,
         "is_night": is_night,
-        "motion_trend": round(motion_trend, 2),
+        "motion_trend": motion_trend,
         "activity_class": activity
     }
 
 
 def generate_fhir_observation(reading: Dict, patient_id: str = "patient-001") -> Dict:
     """Convert sensor reading to FHIR Observation resource."""
-    observation_id = str(uuid.uuid4())
+    subject = FHIR_SUBJECTS.get(patient_id)
+    if subject is None:
+        subject = FHIR_SUBJECTS[patient_id] = {"reference": f"Patient/{patient_id}"}
     
     return {
         "resourceType": "Observation",
-        "id": observation_id,
+        "id": reading["id"],  # One observation per reading, so reuse its id
         "status": "final",
-        "category": [{
-            "coding": [{
-                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                "code": "vital-signs",
-                "display": "Vital Signs"
-            }]
-        }],
-        "code": {
-            "coding": [{
-                "system": "http://loinc.org",
-                "code": "85353-1",
-                "display": "Vital signs, weight, height, head circumference, oxygen saturation & BMI panel"
-            }],
-            "text": "Sensor Reading"
-        },
-        "subject": {
-            "reference": f"Patient/{patient_id}"
-        },
+        "category": FHIR_CATEGORY,
+        "code": FHIR_CODE,
+        "subject": subject,
         "effectiveDateTime": reading["timestamp"],
         "issued": reading["timestamp"],
         "component": [
             {
-                "code": {
-                    "coding": [{
-                        "system": "http://loinc.org",
-                        "code": "8310-5",
-                        "display": "Body temperature"
-                    }]
-                },
+                "code": FHIR_TEMPERATURE_CODE,
                 "valueQuantity": {
                     "value": reading["temperature"],
                     "unit": "Cel",
@@ -219,116 +363,148 @@ def generate_fhir_observation(reading: Dict, patient_id: str = "patient-001") ->
                 }
             },
             {
-                "code": {
-                    "coding": [{
-                        "system": "http://snomed.info/sct",
-                        "code": "52821000",
-                        "display": "Activity"
-                    }]
-                },
+                "code": FHIR_MOTION_CODE,
                 "valueInteger": reading["motion_level"]
             },
             {
-                "code": {
-                    "coding": [{
-                        "system": "http://loinc.org",
-                        "code": "89020-2",
-                        "display": "Sound level"
-                    }]
-                },
+                "code": FHIR_SOUND_CODE,
                 "valueInteger": reading["sound_level"]
             },
             {
-                "code": {
-                    "text": "Activity Classification"
-                },
+                "code": FHIR_CLASSIFICATION_CODE,
                 "valueString": reading["activity_class"]
             }
         ]
     }
 
 
-def generate_dataset() -> Tuple[List[Dict], List[Dict]]:
-    """Generate complete dataset with FHIR observations."""
+def _gen_one(activity: str, count: int, seed: SeedSequence) -> Dict[str, np.ndarray]:
+    """Generate all columns of one activity class, with its own generator."""
+    rng = Generator(SFC64(seed))
+    
+    # Sample all sensor values of this class at once
+    activity_id = ACT_TO_ID[activity]
+    batch = generate_sensor_batch(activity_id, count, rng)
+    batch["id"] = np.array(generate_uuids(count, rng), dtype=object)
+    batch["timestamp"] = generate_timestamps(batch["hour_of_day"], rng)
+    batch["activity_id"] = np.full(count, activity_id, dtype=np.uint8)
+    return batch
+
+
+def generate_dataset() -> Dict[str, np.ndarray]:
+    """Generate complete dataset, one array per column."""
     print("🏥 Generating Smart Patient Room Monitor Training Data")
     print("=" * 60)
     
-    readings = []
-    observations = []
+    activities = list(CLASS_DISTRIBUTION)
+    counts = [int(NUM_SAMPLES * CLASS_DISTRIBUTION[activity]) for activity in activities]
+    for activity, count in zip(activities, counts):
+        print(f"Generating {count:5d} samples for {activity:15s} ({CLASS_DISTRIBUTION[activity]*100:4.1f}%)")
     
-    # Generate samples for each class
-    for activity, percentage in CLASS_DISTRIBUTION.items():
-        count = int(NUM_SAMPLES * percentage)
-        print(f"Generating {count:5d} samples for {activity:15s} ({percentage*100:4.1f}%)")
-        
-        for _ in range(count):
-            # Generate timestamp
-            hour = get_hour_for_activity(activity)
-            timestamp = datetime.now() - timedelta(
-                days=random.randint(0, 30),
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59)
-            )
-            timestamp = timestamp.replace(hour=hour)
-            
-            # Generate reading
-            reading = generate_sensor_reading(activity, timestamp)
-            readings.append(reading)
-            
-            # Generate FHIR observation
-            observation = generate_fhir_observation(reading)
-            observations.append(observation)
+    # Classes are independent, so generate each in its own process, from
+    # its own child seed (reproducible when RANDOM_SEED is set)
+    seeds = SeedSequence(RANDOM_SEED).spawn(len(activities))
+    with ProcessPoolExecutor(max_workers=min(len(activities), os.cpu_count() or 1)) as ex:
+        batches = list(ex.map(_gen_one, activities, counts, seeds))
     
-    # Shuffle
-    combined = list(zip(readings, observations))
-    random.shuffle(combined)
-    readings, observations = zip(*combined)
+    readings = {
+        column: np.concatenate([batch[column] for batch in batches])
+        for column in batches[0]
+    }
     
-    return list(readings), list(observations)
+    # Shuffle all columns with one permutation
+    order = RNG.permutation(len(readings["id"]))
+    return {column: values[order] for column, values in readings.items()}
+
+
+def iter_fhir_observations(readings: Dict[str, np.ndarray]) -> Iterator[Dict]:
+    """Yield a FHIR observation per reading, in dataset order."""
+    for (reading_id, timestamp, hour, is_night,
+         temperature, motion, sound, motion_trend, activity_id) in zip(
+        readings["id"].tolist(),
+        readings["timestamp"].tolist(),
+        readings["hour_of_day"].tolist(),
+        readings["is_night"].tolist(),
+        # Re-rounded after widening so float32 21.7 is written as 21.7
+        np.round(readings["temperature"].astype(np.float64), 1).tolist(),
+        readings["motion_level"].tolist(),
+        readings["sound_level"].tolist(),
+        np.round(readings["motion_trend"].astype(np.float64), 2).tolist(),
+        readings["activity_id"].tolist()
+    ):
+        reading = generate_sensor_reading(
+            reading_id, ACTIVITIES[activity_id], timestamp, hour, is_night,
+            temperature, motion, sound, motion_trend
+        )
+        yield generate_fhir_observation(reading)
 
 
-def save_csv(readings: List[Dict], filename: str):
+def activity_classes(readings: Dict[str, np.ndarray]) -> pd.Categorical:
+    """Activity class labels of the readings, dictionary-encoded."""
+    return pd.Categorical.from_codes(readings["activity_id"], categories=ACTIVITIES)
+
+
+def save_csv(readings: Dict[str, np.ndarray], filename: str):
     """Save readings to CSV."""
-    df = pd.DataFrame(readings)
-    # Reorder columns
+    # Adopt the column arrays directly, in CSV column order
     columns = ["id", "timestamp", "temperature", "motion_level", "sound_level", 
-               "hour_of_day", "is_night", "motion_trend", "activity_class"]
-    df = df[columns]
-    df.to_csv(filename, index=False)
+               "hour_of_day", "is_night", "motion_trend"]
+    df = pd.DataFrame({column: readings[column] for column in columns})
+    # Labels as a categorical: a one-byte code per row plus the class names
+    df["activity_class"] = activity_classes(readings)
+    df = df.astype({
+        "temperature": "float32",
+        "motion_level": "uint8",
+        "sound_level": "uint8",
+        "hour_of_day": "uint8",
+        "is_night": "uint8",
+        "motion_trend": "float32"
+    })
+    # Arrow's multithreaded C++ writer instead of pandas' Python CSV engine
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), filename)
     print(f"💾 Saved CSV: {filename}")
 
 
-def save_fhir_bundle(observations: List[Dict], filename: str):
-    """Save FHIR observations as a Bundle."""
-    bundle = {
-        "resourceType": "Bundle",
-        "type": "collection",
-        "entry": [{"resource": obs} for obs in observations]
-    }
-    with open(filename, 'w') as f:
-        json.dump(bundle, f, indent=2)
+def save_fhir_bundle(observations: Iterable[Dict], filename: str):
+    """Save FHIR observations as a Bundle (one entry per line)."""
+    # Written entry by entry, so observations can be produced lazily and
+    # neither they nor the Bundle are ever held in memory as a whole
+    with open(filename, 'wb') as f:
+        f.write(b'{"resourceType":"Bundle","type":"collection","entry":[\n')
+        for i, obs in enumerate(observations):
+            if i:
+                f.write(b',\n')
+            f.write(orjson.dumps({"resource": obs}))
+        f.write(b'\n]}\n')
     print(f"💾 Saved FHIR Bundle: {filename}")
 
 
-def print_statistics(readings: List[Dict]):
+def print_statistics(readings: Dict[str, np.ndarray]):
     """Print dataset statistics."""
-    df = pd.DataFrame(readings)
+    total = len(readings["id"])
+    class_counts = np.bincount(readings["activity_id"], minlength=len(ACTIVITIES))
+    night = int(readings["is_night"].sum())
+    day = total - night
+    temperature = readings["temperature"]
+    motion = readings["motion_level"]
+    sound = readings["sound_level"]
     
     print("\n" + "=" * 60)
     print("📊 Dataset Statistics")
     print("=" * 60)
-    print(f"Total samples: {len(readings)}")
+    print(f"Total samples: {total}")
     print(f"\nClass distribution:")
-    print(df['activity_class'].value_counts().sort_index())
+    for activity, count in zip(ACTIVITIES, class_counts):
+        print(f"  {activity:15s} {count:5d}")
     
     print(f"\nFeature ranges:")
-    print(f"  Temperature: {df['temperature'].min():.1f} - {df['temperature'].max():.1f} °C")
-    print(f"  Motion:      {df['motion_level'].min()} - {df['motion_level'].max()}")
-    print(f"  Sound:       {df['sound_level'].min()} - {df['sound_level'].max()}")
+    print(f"  Temperature: {temperature.min():.1f} - {temperature.max():.1f} °C")
+    print(f"  Motion:      {motion.min()} - {motion.max()}")
+    print(f"  Sound:       {sound.min()} - {sound.max()}")
     
     print(f"\nTime distribution:")
-    print(f"  Night (is_night=1): {(df['is_night'] == 1).sum()} ({(df['is_night'] == 1).sum()/len(df)*100:.1f}%)")
-    print(f"  Day (is_night=0):   {(df['is_night'] == 0).sum()} ({(df['is_night'] == 0).sum()/len(df)*100:.1f}%)")
+    print(f"  Night (is_night=1): {night} ({night/total*100:.1f}%)")
+    print(f"  Day (is_night=0):   {day} ({day/total*100:.1f}%)")
 
 
 # ============================================================================
@@ -339,11 +515,11 @@ if __name__ == "__main__":
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     # Generate data
-    readings, observations = generate_dataset()
+    readings = generate_dataset()
     
-    # Save files
+    # Save files (FHIR observations are built while the Bundle is written)
     save_csv(readings, f"{OUTPUT_DIR}/training_data.csv")
-    save_fhir_bundle(observations, f"{OUTPUT_DIR}/fhir_observations.json")
+    save_fhir_bundle(iter_fhir_observations(readings), f"{OUTPUT_DIR}/fhir_observations.json")
     
     # Print statistics
     print_statistics(readings)